@@ -17,7 +17,7 @@ import click
 
 # from . import catalog as c
 from .pycompat import relpath
-from .potranslator import PoTranslator
+from .potranslator import PoTranslator, DEFAULT_CACHE_FILE
 from . import polib
 
 
@@ -39,32 +39,34 @@ def get_lang_dirs(path):
 # ==================================
 # commands
 
-def update(locale_dir, pot_dir, languages):
+def update(locale_dir, pot_dir, languages, cache_file=DEFAULT_CACHE_FILE):
     """
     Update specified language's po files from pot.
 
     :param unicode locale_dir: path for locale directory
     :param unicode pot_dir: path for pot directory
     :param tuple languages: languages to update po files
+    :param unicode cache_file: path for the translation memory, None to disable it
     :return: Dict of POFiles.
     :rtype: dict
     """
-    translator = PoTranslator(pot_dir=pot_dir, locale_dir=locale_dir)
+    translator = PoTranslator(pot_dir=pot_dir, locale_dir=locale_dir, cache_file=cache_file)
     results = translator.translate_all_pot(target_langs=languages, auto_save=True)
     return results
 
 
-def build(locale_dir, output_dir, languages):
+def build(locale_dir, output_dir, languages, cache_file=DEFAULT_CACHE_FILE):
     """
     Biuilds specified language's mo files from pot.
 
     :param unicode locale_dir: path for locale directory
     :param unicode output_dir: path for mo output directory
     :param tuple languages: languages to update po files
+    :param unicode cache_file: path for the translation memory, None to disable it
     :return: Dict of POFiles.
     :rtype: dict
     """
-    translator = PoTranslator(pot_dir=output_dir, locale_dir=locale_dir)
+    translator = PoTranslator(pot_dir=output_dir, locale_dir=locale_dir, cache_file=cache_file)
     results = translator.translate_all_pot(target_langs=languages, auto_save=True, compiled=True)
     return results
 
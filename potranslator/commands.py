@@ -21,6 +21,7 @@ import click
 
 from . import basic
 from . import transifex
+from .potranslator import DEFAULT_CACHE_FILE
 from .pycompat import execfile_, relpath
 
 ENVVAR_PREFIX = 'POTRANSLATOR'
@@ -191,6 +192,21 @@ option_transifex_project_name = click.option(
     type=str, metavar='<PROJECT-NAME>', show_default=True,
     help="Your transifex project name. default is None")
 
+option_cache_file = click.option(
+    '--cache-file',
+    envvar=ENVVAR_PREFIX + '_CACHE_FILE',
+    type=click.Path(exists=False, dir_okay=False),
+    default=DEFAULT_CACHE_FILE, metavar='<FILE>', show_default=True,
+    help="SQLite translation memory, msgids found in it are not sent to "
+         "Google Translate again.")
+
+option_no_cache = click.option(
+    '--no-cache',
+    envvar=ENVVAR_PREFIX + '_NO_CACHE',
+    is_flag=True, default=False,
+    help="Disable the translation memory, every msgid is sent to Google "
+         "Translate.")
+
 CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
 
 # ==================================
@@ -278,7 +294,9 @@ def main(ctx, config, tag):
 @option_locale_dir
 @option_pot_dir
 @option_language
-def update(locale_dir, pot_dir, language):
+@option_cache_file
+@option_no_cache
+def update(locale_dir, pot_dir, language, cache_file, no_cache):
     """
     Update specified language's po files from pot.
 
@@ -304,7 +322,8 @@ def update(locale_dir, pot_dir, language):
                % locals())
         raise click.BadParameter(msg, param_hint='language')
 
-    basic.update(locale_dir, pot_dir, languages)
+    basic.update(locale_dir, pot_dir, languages,
+                 cache_file=None if no_cache else cache_file)
     return
 
 
@@ -312,7 +331,9 @@ def update(locale_dir, pot_dir, language):
 @option_locale_dir
 @option_output_dir
 @option_language
-def build(locale_dir, output_dir, language):
+@option_cache_file
+@option_no_cache
+def build(locale_dir, output_dir, language, cache_file, no_cache):
     """
     Update specified language's po files from pot.
     """
@@ -325,7 +346,8 @@ def build(locale_dir, output_dir, language):
             os.path.samefile(locale_dir, output_dir)):
         output_dir = locale_dir
 
-    basic.build(locale_dir, output_dir, languages)
+    basic.build(locale_dir, output_dir, languages,
+                cache_file=None if no_cache else cache_file)
 
 
 @main.command(context_settings=CONTEXT_SETTINGS)
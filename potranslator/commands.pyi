@@ -14,12 +14,16 @@ def main(ctx: Any,
 
 def update(locale_dir: Text,
            pot_dir: Text,
-           language: Text
+           language: Text,
+           cache_file: Text,
+           no_cache: bool
            ) -> None: ...
 
 def build(locale_dir: Text,
            pot_dir: Text,
-           language: Text
+           language: Text,
+           cache_file: Text,
+           no_cache: bool
           ) -> None: ...
 
 def stat(locale_dir: Text,
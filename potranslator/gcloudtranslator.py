@@ -1,10 +1,107 @@
+import asyncio
 import google.auth
+from google.api_core.exceptions import ResourceExhausted
 from google.cloud import translate
+from google.cloud.translate_v3.services.translation_service.transports import (
+    TranslationServiceGrpcTransport,
+)
 import os
-import toolz
-from operator import add
-from collections import OrderedDict
+import re
+import numpy as np
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import sys
+import threading
+import time
+from itertools import islice
+from html import escape, unescape
+
+try:
+    from numba import njit
+except ImportError:  # pragma: no cover
+    # numba is optional, the cutoffs are then computed with vectorized numpy
+    njit = None
+
+
+# gRPC channel options of the shared client: unlimited message sizes as in the default transport,
+# plus keepalive pings so the HTTP/2 connection stays open between bursts of requests
+_CHANNEL_OPTIONS = [
+    ("grpc.max_send_message_length", -1),
+    ("grpc.max_receive_message_length", -1),
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+]
+
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_client():
+    """
+    Returns the TranslationServiceClient shared by all the Translator instances of the process,
+    so that the gRPC channel, its TLS session and the auth token are set up only once.
+    """
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            channel = TranslationServiceGrpcTransport.create_channel(
+                options=_CHANNEL_OPTIONS
+            )
+            _CLIENT = translate.TranslationServiceClient(
+                transport=TranslationServiceGrpcTransport(channel=channel)
+            )
+    return _CLIENT
+
+
+# a packed document holds the strings of a batch, each one wrapped in a numbered span
+_SPAN_RE = re.compile(r'<span id="(\d+)">(.*?)</span>', re.S)
+
+# translation of a string unpacked from a document, read like the ones of the API responses
+_Translation = namedtuple("_Translation", ["translated_text"])
+
+
+def _scan_cutoffs(lengths, mins, maxs):
+    """
+    Greedy batch scanner: a batch is closed once it holds mins characters, or before a string
+    would push it over maxs characters.
+    """
+    out = np.empty(len(lengths), np.int64)
+    n = 0
+    acc = 0
+    for i in range(len(lengths)):
+        if acc > 0 and acc + lengths[i] > maxs:
+            out[n] = i
+            n += 1
+            acc = 0
+        acc += lengths[i]
+        if acc >= mins:
+            out[n] = i + 1
+            n += 1
+            acc = 0
+    # the last batch ends at the last string, even when it only holds empty strings
+    if n == 0 or out[n - 1] != len(lengths):
+        out[n] = len(lengths)
+        n += 1
+    return out[:n]
+
+
+def _numpy_cutoffs(lengths, mins, maxs):
+    """
+    Vectorized batch boundaries: a batch is closed as soon as the running total crosses a multiple
+    of mins characters, strings that could push a batch over maxs characters get a batch of their own.
+    """
+    cum = np.cumsum(lengths)
+    cutoffs = np.searchsorted(cum, np.arange(mins, cum[-1], mins)) + 1
+    long_items = np.flatnonzero(lengths > maxs - mins)
+    cutoffs = np.union1d(
+        cutoffs, np.concatenate((long_items, long_items + 1, [lengths.size]))
+    )
+    return cutoffs[cutoffs > 0]
+
+
+# the scalar scanner only pays off once compiled
+_cutoffs = njit(cache=True)(_scan_cutoffs) if njit is not None else _numpy_cutoffs
 
 
 class TranslatedText(object):
@@ -15,37 +112,67 @@ class TranslatedText(object):
 
 
 class Translator(object):
-    def __init__(self):
+    def __init__(
+        self,
+        mime_type="text/plain",
+        memo_size=50000,
+        max_workers=None,
+        pack_strategy=None,
+    ):
+        self.mime_type = mime_type
+        # "html" sends the plain text strings of a batch as one text/html document
+        self.pack_strategy = pack_strategy
+        # number of batch requests in flight at once, kept low to stay under the API QPS quota
+        self.max_workers = max_workers or int(
+            os.environ.get("POTRANSLATOR_CONCURRENCY", 8)
+        )
+        # in-process memo of (src, dest, text) -> TranslatedText, evicted in LRU order
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+        # shared by all the translate calls, so concurrent languages stay under max_workers requests
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+        self._async_client = None
+        self._async_loop = None
+        self._async_slots = None
+        # per request limits: code points, number of contents and payload size
+        self.max_chars = 28000
+        self.max_items = 100
+        self.max_bytes = 9000000
+        # number of strings read from the input at a time when building the batches
+        self.window_size = 1000
+        # attempts made with exponential backoff when the quota is exhausted
+        self.max_retries = 5
         if os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", "") == "":
             raise ValueError(
                 "Please set GOOGLE_APPLICATION_CREDENTIALS service account json"
             )
         else:
             self.credentials, self.project = google.auth.default()
-            self.tclient = translate.TranslationServiceClient()
+            self.tclient = get_client()
 
     def count_chars(self, trans_text):
         """
-        text should only be a list[list[str]]
+        Computes the batch boundaries of trans_text: a batch is closed as soon as it holds 5K characters
+        and before it would exceed max_chars.
+
+        :return: list.
+            Strictly increasing end indices (exclusive) of the batches, the last one being len(trans_text).
         """
         mins = 5000
-        maxs = 20000
-        steps = 1
-        cutoffs = []
-        for r in enumerate(toolz.accumulate(add, toolz.map(len, trans_text))):
-            if r[1] >= mins * steps and r[1] < maxs * steps:
-                cutoffs.append(r[0])
-                steps = steps + 1
-            elif r[1] >= mins * steps and r[1] >= maxs * steps:
-                if steps > 1:
-                    cutoffs.append(r[0] - 1)
-                    steps = steps + 1
-                else:
-                    cutoffs.append(r[0])
-                    print(f"single string element too long!  (l: {r[1]})")
-        cutoffs.append(len(trans_text))
+        maxs = self.max_chars
+        lengths = np.fromiter(
+            map(len, trans_text), dtype=np.int64, count=len(trans_text)
+        )
+        if lengths.size == 0:
+            return []
+        for idx in np.flatnonzero(lengths > maxs):
+            print(
+                f"single string element too long, translated in pieces  (l: {lengths[idx]})"
+            )
+        cutoffs = _cutoffs(lengths, mins, maxs).tolist()
         print(
-            f"make_batch for {sum(list(map(len, trans_text)))} chars in {len(trans_text)} seqs | calculated cutoffs: {cutoffs}"
+            f"make_batch for {lengths.sum()} chars in {len(trans_text)} seqs | calculated cutoffs: {cutoffs}"
         )
         return cutoffs
 
@@ -53,75 +180,326 @@ class Translator(object):
         """
         The Cloud Translation API is optimized for a recommended length for each request of 5K characters (code points).
         For Cloud Translation - Advanced, the maximum number of code points for a single request is 30K.
+
+        Yields the requests lazily, so trans_text can be a generator.
         """
         template_request = {
             "parent": parent,
             "contents": [],
-            "mime_type": "text/plain",  # mime types: text/plain, text/html
+            "mime_type": self.mime_type,  # mime types: text/plain, text/html
             "target_language_code": dest,
         }
         if not src == "auto":
             template_request.update({"source_language_code": src})
 
-        cuts = self.count_chars(trans_text)
+        # trans_text may be any iterable, it is consumed window_size strings at a time
+        texts = iter(trans_text)
+        window = list(islice(texts, self.window_size))
+        while window:
+            window_texts = iter(window)
+            prev = 0
+            cutoffs = self.count_chars(window)
+            # a string left out of the batches would shift every following translation
+            if not cutoffs or cutoffs[-1] != len(window):
+                raise ValueError(
+                    f"batch cutoffs {cutoffs} do not cover the {len(window)} strings"
+                )
+            for cut in cutoffs:
+                batch = list(islice(window_texts, cut - prev))
+                if self._packable(batch):
+                    # a packed batch is a single document, the item limit does not apply
+                    yield {**template_request, "contents": batch}
+                    prev = cut
+                    continue
+                for contents in self._split_contents(batch):
+                    # every batch gets its own contents list, the template is never shared
+                    req = {**template_request, "contents": contents}
+                    print(
+                        f"req {cut} -> {int(sys.getsizeof(req['contents'])) / 1024} kbytes ({len(req['contents'])} )"
+                    )
+                    yield req
+                prev = cut
+            window = list(islice(texts, self.window_size))
 
-        data_dict = OrderedDict()
-        for i in cuts:
-            data_dict.update({str(i): template_request.copy()})
+    def _split_contents(self, contents):
+        """
+        Splits the contents of a batch so that each request holds at most max_items strings
+        and max_bytes of UTF-8 payload.
+        """
+        # a code point is at most 4 bytes in UTF-8, most batches can skip the encoding
+        if (
+            len(contents) <= self.max_items
+            and 4 * sum(map(len, contents)) <= self.max_bytes
+        ):
+            yield contents
+            return
+        chunk = []
+        size = 0
+        for text in contents:
+            nbytes = len(text.encode("utf-8"))
+            if chunk and (
+                len(chunk) >= self.max_items or size + nbytes > self.max_bytes
+            ):
+                yield chunk
+                chunk = []
+                size = 0
+            chunk.append(text)
+            size += nbytes
+        if chunk:
+            yield chunk
 
-        request_batches = []
+    def _packable(self, contents):
+        """
+        Tells whether the strings of contents can be sent as a single html document, without
+        building it: packing must be enabled, there must be several strings, none of them may
+        contain html, newlines or surrounding whitespace, and the document must fit in max_chars.
+        """
+        if (
+            self.pack_strategy != "html"
+            or self.mime_type != "text/plain"
+            or len(contents) < 2
+        ):
+            return False
+        size = 0
+        for idx, text in enumerate(contents):
+            if "<" in text or "&" in text or "\n" in text or text != text.strip():
+                return False
+            # the span markup, and ">" is the only character escaped once "<" and "&" are excluded
+            size += len(text) + 3 * text.count(">") + 19 + len(str(idx))
+        return size <= self.max_chars
 
-        if len(cuts) < 1:
-            tr = template_request.copy()
-            tr["contents"] = trans_text
-            request_batches.append(tr)
-        else:
-            x = toolz.first(cuts)
-            rest = list(toolz.drop(1, cuts))
-            data_dict[str(x)]["contents"] = []
-            for et in enumerate(trans_text):
-                if et[0] < x:
-                    data_dict[str(x)]["contents"].append(et[1])
+    def _pack(self, contents):
+        """
+        Packs the strings of contents, checked with _packable, in a single html document.
+        """
+        return "".join(
+            f'<span id="{idx}">{escape(text, quote=False)}</span>'
+            for idx, text in enumerate(contents)
+        )
+
+    def _unpack(self, contents, translations):
+        """
+        Splits the translated html document back into one translation per string of contents.
+
+        :return: list.
+            The translations, or None when the spans of the document do not match contents.
+        """
+        if not translations:
+            return None
+        spans = _SPAN_RE.findall(translations[0].translated_text)
+        if [int(idx) for idx, _ in spans] != list(range(len(contents))):
+            return None
+        return [_Translation(unescape(text)) for _, text in spans]
+
+    def _exchange(self, req):
+        """
+        Decides how a batch is sent: yields the requests to send, receives their responses
+        and returns the translations of the batch. _request and _request_async only do the sending.
+        """
+        if self._packable(req["contents"]):
+            response = yield {
+                **req,
+                "contents": [self._pack(req["contents"])],
+                "mime_type": "text/html",
+            }
+            translations = self._unpack(req["contents"], response.translations)
+            if translations is not None:
+                return translations
+        # plain mode, a batch that could not be packed is split into regular requests
+        translations = []
+        for contents in self._split_contents(req["contents"]):
+            # the cutoffs give a string longer than max_chars a batch of its own
+            if len(contents) == 1 and len(contents[0]) > self.max_chars:
+                pieces, separators = self._split_text(contents[0])
+                translated = []
+                for piece in pieces:
+                    response = yield {**req, "contents": [piece]}
+                    if not response.translations:
+                        break
+                    translated.append(response.translations[0].translated_text)
                 else:
-                    cuts = rest
-                    if len(cuts) > 0:
-                        x = toolz.first(cuts)
-                        rest = list(toolz.drop(1, cuts))
-                        data_dict[str(x)]["contents"] = []
-                        data_dict[str(x)]["contents"].append(et[1])
-                    else:
-                        data_dict[str(x)]["contents"].append(et[1])
-
-        for idx, req in data_dict.items():
-            print(
-                f"req {idx} -> {int(sys.getsizeof(req['contents'])) / 1024} kbytes ({len(req['contents'])} )"
-            )
-            request_batches.append(req)
+                    text = translated[0]
+                    for separator, piece in zip(separators, translated[1:]):
+                        text += separator + piece
+                    translations.append(_Translation(text))
+                continue
+            response = yield {**req, "contents": contents}
+            translations.extend(response.translations)
+        return translations
 
-        return request_batches
+    def _split_text(self, text):
+        """
+        Splits a string longer than max_chars, preferably at a newline or a space.
 
-    def translate(self, trans_text, src="auto", dest="en"):
+        :return: tuple.
+            The pieces of at most max_chars characters and the separators removed between them.
+        """
+        pieces = []
+        separators = []
+        start = 0
+        while len(text) - start > self.max_chars:
+            end = start + self.max_chars
+            cut = max(text.rfind("\n", start, end), text.rfind(" ", start, end))
+            if cut > start:
+                separator = text[cut]
+            else:
+                cut = end
+                separator = ""
+            pieces.append(text[start:cut])
+            separators.append(separator)
+            start = cut + len(separator)
+        pieces.append(text[start:])
+        return pieces, separators
 
-        # Detail on supported types can be found here
-        location = "global"
-        parent = f"projects/{self.project}/locations/{location}"
+    def _request(self, req):
+        """
+        Sends a batch and returns its translations, as a single document when it can be packed.
+        """
+        with self._slots:
+            exchange = self._exchange(req)
+            try:
+                sub_request = next(exchange)
+                while True:
+                    sub_request = exchange.send(self._send(sub_request))
+            except StopIteration as done:
+                return done.value
+
+    async def _request_async(self, client, req):
+        exchange = self._exchange(req)
+        try:
+            sub_request = next(exchange)
+            while True:
+                sub_request = exchange.send(await self._send_async(client, sub_request))
+        except StopIteration as done:
+            return done.value
+
+    def _backoff(self):
+        # delays between the attempts made when the quota is exhausted
+        return (2**attempt for attempt in range(self.max_retries))
+
+    def _send(self, req):
+        for delay in self._backoff():
+            try:
+                return self.tclient.translate_text(request=req)
+            except ResourceExhausted:
+                time.sleep(delay)
+        return self.tclient.translate_text(request=req)
 
+    async def _send_async(self, client, req):
+        for delay in self._backoff():
+            try:
+                return await client.translate_text(request=req)
+            except ResourceExhausted:
+                await asyncio.sleep(delay)
+        return await client.translate_text(request=req)
+
+    def _memo_get(self, key):
+        with self._memo_lock:
+            translation = self._memo.get(key)
+            if translation is not None:
+                self._memo.move_to_end(key)
+        return translation
+
+    def _memo_put(self, key, translation):
+        with self._memo_lock:
+            self._memo[key] = translation
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+
+    def _lookup(self, trans_text, src, dest, result, misses):
+        """
+        Serves the already translated strings from the memo.
+
+        Appends a translation (None for misses) to result for every string of trans_text,
+        records the index of each miss in misses and yields the texts of the misses.
+        """
         # https://cloud.google.com/translate/docs/supported-formats
         send_list = trans_text
         if isinstance(trans_text, str):
-            send_list = [translate]
+            send_list = [trans_text]
 
-        request_preps = self.make_batches(send_list, src, dest, parent)
+        for text in send_list:
+            translation = self._memo_get((src, dest, text))
+            result.append(translation)
+            if translation is None:
+                misses.append(len(result) - 1)
+                yield text
 
-        responses = toolz.map(
-            lambda req: self.tclient.translate_text(request=req), request_preps
+    def _collect(self, result, misses, req, translations, src, dest):
+        """
+        Stores the translations of a batch in result, misses holds the indices of the batch
+        contents in front. The slots of the contents missing from translations stay None.
+        """
+        for idx, text in enumerate(req["contents"]):
+            position = misses.popleft()
+            if idx < len(translations):
+                # print("Translated text: {}".format(translations[idx].translated_text))
+                result[position] = TranslatedText(translations[idx], src, dest)
+                self._memo_put((src, dest, text), result[position])
+
+    def translate(self, trans_text, src="auto", dest="en"):
+
+        # Detail on supported types can be found here
+        location = "global"
+        parent = f"projects/{self.project}/locations/{location}"
+
+        # serve repeated strings from the memo and only send the misses
+        result = []
+        misses = deque()
+        request_preps = self.make_batches(
+            self._lookup(trans_text, src, dest, result, misses), src, dest, parent
         )
 
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # bounded number of requests in flight, collected in the order of the batches
+            in_flight = deque()
+            for req in request_preps:
+                in_flight.append((req, executor.submit(self._request, req)))
+                if len(in_flight) >= 2 * self.max_workers:
+                    req, future = in_flight.popleft()
+                    self._collect(result, misses, req, future.result(), src, dest)
+            for req, future in in_flight:
+                self._collect(result, misses, req, future.result(), src, dest)
+
+        return result
+
+    def _get_async_client(self):
+        # grpc asyncio channels are bound to the event loop they were created in
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_client = translate.TranslationServiceAsyncClient()
+            self._async_slots = asyncio.Semaphore(self.max_workers)
+            self._async_loop = loop
+        return self._async_client
+
+    async def translate_async(self, trans_text, src="auto", dest="en"):
+        """
+        Coroutine version of translate using the asyncio gRPC client.
+        """
+        location = "global"
+        parent = f"projects/{self.project}/locations/{location}"
+
         result = []
-        for response in responses:
-            # Display the translation for each input text provided
-            for translation in response.translations:
-                # print("Translated text: {}".format(translation.translated_text))
-                result.append(TranslatedText(translation, src, dest))
+        misses = deque()
+        request_preps = list(
+            self.make_batches(
+                self._lookup(trans_text, src, dest, result, misses), src, dest, parent
+            )
+        )
+        if not request_preps:
+            return result
+
+        client = self._get_async_client()
+
+        async def bounded(req):
+            # the semaphore of the event loop is shared by the concurrent translate_async calls
+            async with self._async_slots:
+                return await self._request_async(client, req)
+
+        # gather keeps the responses in the order of the batches
+        responses = await asyncio.gather(*(bounded(req) for req in request_preps))
 
+        for req, translations in zip(request_preps, responses):
+            self._collect(result, misses, req, translations, src, dest)
         return result
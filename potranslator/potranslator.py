@@ -2,17 +2,21 @@
 
 """Main module."""
 
+import asyncio
 import os
-from os import listdir, makedirs
-from os.path import isfile, join, exists
+from os import listdir
 from . import polib, json
 from . import gcloudtranslator
+from .translation_memory import TranslationMemory
 from . import SUPPORTED_LANGUAGES, __version__
 from collections import defaultdict
-from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from codecs import open
+import queue
+import sqlite3
 import sys
+import threading
 import click
 from pathlib import Path
 
@@ -25,6 +29,61 @@ _RESOURCE_PACKAGE = __name__
 
 is_python2 = sys.version_info < (3, 0)
 
+_SUPPORTED = frozenset(SUPPORTED_LANGUAGES)
+
+# expanded when a PoTranslator is created, so that HOME is read at that time
+DEFAULT_CACHE_FILE = "~/.potranslator_cache.sqlite"
+
+# number of parsed files waiting for their translation
+_PREFETCH_SIZE = 4
+
+
+def _prefetch(paths, encoding, maxsize=_PREFETCH_SIZE):
+    """
+    Parses the given po or pot files on a background thread, ahead of their translation.
+
+    :param paths: sequence of strings.
+        Paths of the files to parse, in order.
+    :param encoding: string.
+        Encoding of the files.
+    :param maxsize: int.
+        Maximum number of parsed files kept in memory.
+    :return: generator.
+        The (path, POFile) tuples in the order of paths, a parsing error is raised when its file is reached.
+    """
+    parsed = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def produce():
+        for path in paths:
+            if stop.is_set():
+                return
+            try:
+                parsed.put((path, polib.pofile(path, **{"encoding": encoding}), None))
+            except Exception as e:
+                parsed.put((path, None, e))
+        parsed.put(None)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = parsed.get()
+            if item is None:
+                return
+            path, po, error = item
+            if error is not None:
+                raise error
+            yield path, po
+    finally:
+        stop.set()
+        # unblocks the producer when the files are not all consumed
+        while producer.is_alive():
+            try:
+                parsed.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
 
 class PoTranslator:
     """
@@ -34,14 +93,238 @@ class PoTranslator:
         Path to the pot directory.
     :param locale_dir: string.
         Path to the locale directory.
+    :param cache_file: string.
+        Path to the translation memory database, ~ is expanded. Set to None to disable the cache.
     """
 
-    def __init__(self, pot_dir=None, locale_dir=None):
+    def __init__(self, pot_dir=None, locale_dir=None, cache_file=DEFAULT_CACHE_FILE):
         self.pot_dir = pot_dir
         self.locale_dir = locale_dir
         self.translator = gcloudtranslator.Translator()
+        self.memory = self._open_memory(cache_file)
+        # po and mo files are written in the background while the next file is translated
+        self._io_pool = ThreadPoolExecutor(max_workers=2)
+        self._saves = {}
+        self._saves_lock = threading.Lock()
         return
 
+    @staticmethod
+    def _open_memory(cache_file):
+        if not cache_file:
+            return None
+        path = os.path.expanduser(cache_file)
+        try:
+            return TranslationMemory(path)
+        except sqlite3.Error:
+            if cache_file != DEFAULT_CACHE_FILE:
+                raise
+            # an unwritable home directory only disables the default cache
+            print(
+                _(
+                    "The translation memory {0} could not be opened, translations will not be cached."
+                ).format(path)
+            )
+            return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def flush(self, file_name=None):
+        """
+        Waits until the pending writes of the given file, or of all the files, are on disk.
+
+        :param file_name: string.
+            Path of the file to wait for, all the files when None.
+        """
+        with self._saves_lock:
+            if file_name is None:
+                pending = list(self._saves.values())
+                self._saves.clear()
+            else:
+                pending = (
+                    [self._saves.pop(file_name)] if file_name in self._saves else []
+                )
+        for future in pending:
+            future.result()
+
+    def close(self):
+        """
+        Writes the pending files and releases the background writer and the translation memory.
+        """
+        self.flush()
+        self._io_pool.shutdown(wait=True)
+        if self.memory is not None:
+            self.memory.close()
+
+    def _pending_entries(self, entries, src_lang, target_lang):
+        """
+        Fills the msgstr of the given entries found in the translation memory.
+
+        :param entries: sequence of POEntry.
+            Entries to translate.
+        :param src_lang: string.
+            Source language for translation.
+        :param target_lang: string.
+            Target language for translation.
+        :return: list.
+            A list of (entry, key) tuples for the entries which still have to be translated.
+        """
+        if self.memory is None:
+            return [(entry, None) for entry in entries]
+        keys = [
+            TranslationMemory.make_key(
+                entry.msgid, src_lang, target_lang, self.translator.mime_type
+            )
+            for entry in entries
+        ]
+        cached = self.memory.lookup(keys)
+        to_send = []
+        for entry, key in zip(entries, keys):
+            if key in cached:
+                entry.msgstr = cached[key]
+            else:
+                to_send.append((entry, key))
+        return to_send
+
+    @staticmethod
+    def _unique_msgids(to_send):
+        """
+        Deduplicates the msgids of the entries to translate.
+
+        :param to_send: sequence of (entry, key) tuples.
+            Entries to translate.
+        :return: tuple.
+            A view of the unique msgids, in order, and, for each entry, the index of its msgid in that view.
+        """
+        uniq = {}
+        inv = []
+        for entry, key in to_send:
+            inv.append(uniq.setdefault(entry.msgid, len(uniq)))
+        return uniq.keys(), inv
+
+    def _apply_translations(self, to_send, inv, translations):
+        retrieved = {}
+        for (entry, key), idx in zip(to_send, inv):
+            # msgids missing from the response of the translation service stay untranslated
+            translation = translations[idx] if idx < len(translations) else None
+            if translation is not None:
+                entry.msgstr = translation.text
+                retrieved[key] = entry.msgstr
+        if self.memory is not None:
+            self.memory.store(retrieved.items())
+
+    def _translate_entries(self, entries, src_lang, target_lang):
+        """
+        Fills the msgstr of the given entries, only querying the translator for the msgids
+        that are not already in the translation memory.
+
+        :param entries: sequence of POEntry.
+            Entries to translate.
+        :param src_lang: string.
+            Source language for translation.
+        :param target_lang: string.
+            Target language for translation.
+        """
+        to_send = self._pending_entries(entries, src_lang, target_lang)
+        if to_send:
+            msgids, inv = self._unique_msgids(to_send)
+            translations = self.translator.translate(
+                msgids, src=src_lang, dest=target_lang
+            )
+            self._apply_translations(to_send, inv, translations)
+
+    async def _translate_entries_async(self, entries, src_lang, target_lang):
+        to_send = self._pending_entries(entries, src_lang, target_lang)
+        if to_send:
+            msgids, inv = self._unique_msgids(to_send)
+            translations = await self.translator.translate_async(
+                msgids, src=src_lang, dest=target_lang
+            )
+            self._apply_translations(to_send, inv, translations)
+
+    def _load_po(self, file_name, target_lang, encoding, po=None):
+        if po is None:
+            po = polib.pofile(file_name, **{"encoding": encoding})
+        if target_lang == "auto":
+            try:
+                target_lang = po.metadata["Language"]
+            except KeyError:
+                raise ValueError(
+                    _(
+                        "potranslator could not auto-detect the desired translation language for the file {0}.\nPlease provide a target language."
+                    ).format(file_name)
+                )
+        if target_lang not in SUPPORTED_LANGUAGES:
+            raise ValueError(_("Unsupported language."))
+        return po, target_lang
+
+    def _load_untranslated(self, file_name, target_lang, encoding, po):
+        po, target_lang = self._load_po(file_name, target_lang, encoding, po)
+        return po, target_lang, po.untranslated_entries()
+
+    def _finish(self, po, file_name, target_lang, auto_save, compiled, retrieved):
+        """
+        Marks the catalog as translated, or reports that its translations could not be retrieved, and saves it.
+        """
+        if retrieved:
+            self._mark_translated(po, file_name, target_lang)
+        else:
+            self._report_failure(file_name, target_lang)
+        self._save(po, file_name, target_lang, auto_save, compiled)
+
+    def _mark_translated(self, po, file_name, target_lang):
+        po.metadata["Translated-By"] = "potranslator {0}".format(__version__)
+        po.metadata["Last-Translator"] = "potranslator {0}".format(__version__)
+        po.metadata["Language"] = target_lang
+        # po.metadata["PO-Revision-Date"] = str(datetime.today())
+        po.metadata["PO-Revision-Date"] = datetime.strftime(
+            datetime.now(), "%Y-%m-%d %H:%M"
+        )
+        print(
+            _(
+                "{0} translations for the file {1} have been succesfully retrieved"
+            ).format(SUPPORTED_LANGUAGES[target_lang], file_name)
+        )
+
+    def _report_failure(self, file_name, target_lang):
+        print(
+            _("{0} translations for the file {1} could not be retrieved").format(
+                SUPPORTED_LANGUAGES[target_lang], file_name
+            )
+        )
+
+    @staticmethod
+    def _write(po, file_name, auto_save, compiled):
+        if auto_save:
+            po.save(file_name)
+        if compiled:
+            po.save_as_mofile(file_name.replace(".po", ".mo"))
+
+    def _save(self, po, file_name, target_lang, auto_save, compiled):
+        if auto_save or compiled:
+            # writes of the same file stay in order
+            self.flush(file_name)
+            future = self._io_pool.submit(
+                self._write, po, file_name, auto_save, compiled
+            )
+            with self._saves_lock:
+                self._saves[file_name] = future
+        if auto_save:
+            print(
+                _(
+                    "The file {1} has been succesfully translated in {0} and saved."
+                ).format(SUPPORTED_LANGUAGES[target_lang], file_name)
+            )
+        else:
+            print(
+                _("The file {1} has been succesfully translated in {0}.").format(
+                    SUPPORTED_LANGUAGES[target_lang], file_name
+                )
+            )
+
     def translate(
         self,
         file_name,
@@ -50,6 +333,7 @@ class PoTranslator:
         encoding="utf-8",
         auto_save=False,
         compiled=False,
+        po=None,
     ):
         """
         Translates the given po file in the specified target language.
@@ -66,68 +350,59 @@ class PoTranslator:
             Toggles auto save feature.
         :param compiled: bool.
             Toggles compilation to mo files.
+        :param po: POFile.
+            Already loaded catalog of file_name, parsed from the file when not given.
         :return: tuple.
             A tuple containing the translated version of the original catalog and the status of the POFile.
         """
-        po = polib.pofile(file_name, **{"encoding": encoding})
-        if target_lang == "auto":
+        result = self._translate(
+            file_name, target_lang, src_lang, encoding, auto_save, compiled, po
+        )
+        self.flush(file_name)
+        return result
+
+    def _translate(
+        self, file_name, target_lang, src_lang, encoding, auto_save, compiled, po
+    ):
+        """
+        Same as translate, without waiting for the po and mo files to be written.
+        """
+        po, target_lang, untranslated = self._load_untranslated(
+            file_name, target_lang, encoding, po
+        )
+        if untranslated:
             try:
-                target_lang = po.metadata["Language"]
-            except KeyError:
-                raise ValueError(
-                    _(
-                        "potranslator could not auto-detect the desired translation language for the file {0}.\nPlease provide a target language."
-                    ).format(file_name)
-                )
-        if target_lang not in SUPPORTED_LANGUAGES:
-            raise ValueError(_("Unsupported language."))
-        untranslated = [elmt for elmt in po if elmt.msgstr == "" and not elmt.obsolete]
+                self._translate_entries(untranslated, src_lang, target_lang)
+                retrieved = True
+            except JSONDecodeError:
+                retrieved = False
+            self._finish(po, file_name, target_lang, auto_save, compiled, retrieved)
+        return po, bool(untranslated)
+
+    async def _translate_async(
+        self,
+        file_name,
+        target_lang="auto",
+        src_lang="auto",
+        encoding="utf-8",
+        auto_save=False,
+        compiled=False,
+        po=None,
+    ):
+        """
+        Coroutine version of translate.
+        """
+        po, target_lang, untranslated = self._load_untranslated(
+            file_name, target_lang, encoding, po
+        )
         if untranslated:
-            updated = True
             try:
-                translations = self.translator.translate(
-                    [elmt.msgid for elmt in untranslated],
-                    src=src_lang,
-                    dest=target_lang,
-                )
-                for entry, translation in zip(untranslated, translations):
-                    entry.msgstr = translation.text
-                po.metadata["Translated-By"] = "potranslator {0}".format(__version__)
-                po.metadata["Last-Translator"] = "potranslator {0}".format(__version__)
-                po.metadata["Language"] = target_lang
-                # po.metadata["PO-Revision-Date"] = str(datetime.today())
-                po.metadata["PO-Revision-Date"] = datetime.strftime(
-                    datetime.now(), "%Y-%m-%d %H:%M"
-                )
-                print(
-                    _(
-                        "{0} translations for the file {1} have been succesfully retrieved"
-                    ).format(SUPPORTED_LANGUAGES[target_lang], file_name)
-                )
-            except JSONDecodeError as e:
-                print(
-                    _(
-                        "{0} translations for the file {1} could not be retrieved"
-                    ).format(SUPPORTED_LANGUAGES[target_lang], file_name)
-                )
-            if auto_save:
-                po.save(file_name)
-                print(
-                    _(
-                        "The file {1} has been succesfully translated in {0} and saved."
-                    ).format(SUPPORTED_LANGUAGES[target_lang], file_name)
-                )
-            else:
-                print(
-                    _("The file {1} has been succesfully translated in {0}.").format(
-                        SUPPORTED_LANGUAGES[target_lang], file_name
-                    )
-                )
-            if compiled:
-                po.save_as_mofile(file_name.replace(".po", ".mo"))
-        else:
-            updated = False
-        return po, updated
+                await self._translate_entries_async(untranslated, src_lang, target_lang)
+                retrieved = True
+            except JSONDecodeError:
+                retrieved = False
+            self._finish(po, file_name, target_lang, auto_save, compiled, retrieved)
+        return po, bool(untranslated)
 
     def translate_all_locale(
         self, src_lang="auto", encoding="utf-8", auto_save=False, compiled=False
@@ -146,11 +421,9 @@ class PoTranslator:
         :return: Dictionary.
             A dictionary of po files.
         """
-        all_locales = listdir(self.locale_dir)
-        locales = [locale for locale in all_locales if locale in SUPPORTED_LANGUAGES]
-        unsupported_locales = [
-            locale for locale in all_locales if locale not in SUPPORTED_LANGUAGES
-        ]
+        locales, unsupported_locales = [], []
+        for locale in listdir(self.locale_dir):
+            (locales if locale in _SUPPORTED else unsupported_locales).append(locale)
         print(
             _("Attempting to translate the supported locales:\n{0}").format(
                 ", ".join(locales)
@@ -163,31 +436,24 @@ class PoTranslator:
                 ).format(", ".join(locales))
             )
         results = defaultdict(dict)
-        for locale in locales:
-            po_files = []
-            for dirpath, dirnames, filenames in os.walk(
-                join(self.locale_dir, locale, "LC_MESSAGES")
-            ):
-
-                sub_po_files = [
-                    os.path.join(dirpath, file)
-                    for file in filenames
-                    if file.endswith(".po")
-                ]
-                for pof in sub_po_files:
-                    po_files.append(pof)
-
-            for po_file in po_files:
-                # path = join(self.locale_dir, locale, "LC_MESSAGES", po_file)
-                path = po_file
-                results[locale][po_file], updated = self.translate(
-                    path,
-                    src_lang=src_lang,
-                    target_lang=locale,
-                    encoding=encoding,
-                    auto_save=auto_save,
-                    compiled=compiled,
-                )
+        po_files = {
+            str(path): locale
+            for locale in locales
+            for path in Path(self.locale_dir, locale, "LC_MESSAGES").rglob("*.po")
+        }
+        # the next po files are parsed while the current one is translated
+        for po_file, po in _prefetch(list(po_files), encoding):
+            locale = po_files[po_file]
+            results[locale][po_file], updated = self._translate(
+                po_file,
+                src_lang=src_lang,
+                target_lang=locale,
+                encoding=encoding,
+                auto_save=auto_save,
+                compiled=compiled,
+                po=po,
+            )
+        self.flush()
         return results
 
     def translate_from_pot(
@@ -199,6 +465,7 @@ class PoTranslator:
         encoding="utf-8",
         auto_save=False,
         compiled=False,
+        pot=None,
     ):
         """
         Translates the given pot file in the specified target languages.
@@ -215,60 +482,110 @@ class PoTranslator:
             Toggles auto save feature.
         :param compiled: bool.
             Toggles compilation to mo files.
+        :param pot: POFile.
+            Already loaded catalog of filename, parsed from the file when not given.
         :return: Dictionary.
             A dictionary of po files.
         """
+        results = self._translate_from_pot(
+            filename, status, target_langs, src_lang, encoding, auto_save, compiled, pot
+        )
+        self.flush()
+        return results
 
-        base1 = Path(self.pot_dir)
-        bj = "##".join(base1.parts)
-
-        pot = polib.pofile(filename, **{"encoding": encoding})
+    def _translate_from_pot(
+        self,
+        filename,
+        status,
+        target_langs,
+        src_lang,
+        encoding,
+        auto_save,
+        compiled,
+        pot=None,
+    ):
+        if pot is None:
+            pot = polib.pofile(filename, **{"encoding": encoding})
+        # the pot file is serialized once and written as is for every new language
+        pot_text = str(pot)
+        pot_bytes = pot_text.encode(encoding)
         results = {}
 
-        for target_lang in target_langs:
-
-            po_file_path = Path(filename)
-            pj = "##".join(po_file_path.parent.parts)
-            upperb = pj.replace(bj, "")[2:].replace("##", "/")
-
-            # filename.split("/")[-1].split("\\")[-1][:-1]
-            po_file_name = po_file_path.name[:-1]
-            # print(f'from "{filename}" to short: {po_file_name}')
-            # po_path = str(
-            #     Path(self.locale_dir, target_lang, "LC_MESSAGES", po_file_name))
-            # )
-            # po_dir = join(self.locale_dir, "/".join((target_lang, "LC_MESSAGES")))
-            base_po_dir = Path(self.locale_dir, target_lang, "LC_MESSAGES")
-            if len(upperb) > 0:
-                base_po_dir = base_po_dir / upperb
-
-            po_path = str(base_po_dir / po_file_name)
-            po_dir = str(base_po_dir)
-            # print(f'new dirs: "{po_path}" "{po_dir}"')
-
-            if not isfile(po_path):
-                if not exists(po_dir):
-                    makedirs(po_dir)
-                po = deepcopy(pot)
-                po.save(po_path)
-                status["created"] += 1
-                click.echo("Created: {0}".format(po_file_name))
-            results[target_lang], updated = self.translate(
-                po_path,
-                target_lang=target_lang,
-                src_lang=src_lang,
-                encoding=encoding,
-                auto_save=auto_save,
-                compiled=compiled,
+        tasks = [
+            (target_lang,)
+            + self._create_po(
+                filename, pot_text, pot_bytes, target_lang, status, encoding
             )
-            if updated:
-                status["updated"] += 1
-                click.echo("Updated: {0}".format(po_file_name))
-            else:
-                status["not_changed"] += 1
-                click.echo("Not Changed: {0}".format(po_file_name))
+            for target_lang in target_langs
+        ]
+        # each language has its own po file, they are translated concurrently
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(len(tasks), self.translator.max_workers))
+        ) as executor:
+            futures = [
+                (
+                    target_lang,
+                    po_file_name,
+                    executor.submit(
+                        self._translate,
+                        po_path,
+                        target_lang=target_lang,
+                        src_lang=src_lang,
+                        encoding=encoding,
+                        auto_save=auto_save,
+                        compiled=compiled,
+                        po=po,
+                    ),
+                )
+                for target_lang, po_path, po_file_name, po in tasks
+            ]
+            for target_lang, po_file_name, future in futures:
+                results[target_lang], updated = future.result()
+                self._update_status(status, updated, po_file_name)
         return results
 
+    def _create_po(self, filename, pot_text, pot_bytes, target_lang, status, encoding):
+        """
+        Creates the po file of the given pot file for the target language if it does not exist yet.
+
+        :param pot_text: string.
+            Content of the pot file.
+        :param pot_bytes: bytes.
+            Content of the pot file encoded with encoding.
+
+        :return: tuple.
+            The path and the name of the po file, and the new catalog when it has just been created (None otherwise).
+        """
+        po_file_path = Path(filename)
+        # filename.split("/")[-1].split("\\")[-1][:-1]
+        po_file_name = po_file_path.name[:-1]
+        # the po file mirrors the sub folder of the pot file in the pot folder
+        rel = po_file_path.parent.relative_to(Path(self.pot_dir))
+        base_po_dir = Path(self.locale_dir, target_lang, "LC_MESSAGES") / rel
+
+        po_path = base_po_dir / po_file_name
+
+        po = None
+        if not po_path.is_file():
+            base_po_dir.mkdir(parents=True, exist_ok=True)
+            po_path.write_bytes(pot_bytes)
+            po = polib.pofile(pot_text, **{"encoding": encoding})
+            status["created"] += 1
+            click.echo("Created: {0}".format(po_file_name))
+        return str(po_path), po_file_name, po
+
+    @staticmethod
+    def _update_status(status, updated, po_file_name):
+        if updated:
+            status["updated"] += 1
+            click.echo("Updated: {0}".format(po_file_name))
+        else:
+            status["not_changed"] += 1
+            click.echo("Not Changed: {0}".format(po_file_name))
+
+    def _pot_files(self):
+        return [str(path) for path in Path(self.pot_dir).rglob("*.pot")]
+
     def translate_all_pot(
         self,
         target_langs,
@@ -293,18 +610,7 @@ class PoTranslator:
         :return: Dictionary.
             A dictionary of po files.
         """
-        # pot_files = [file for file in listdir(self.pot_dir) if file.endswith(".pot")]
-        pot_files = []
-        ########
-        for dirpath, dirnames, filenames in os.walk(self.pot_dir):
-
-            sub_pot_files = [
-                os.path.join(dirpath, file)
-                for file in filenames
-                if file.endswith(".pot")
-            ]
-            for pof in sub_pot_files:
-                pot_files.append(pof)
+        pot_files = self._pot_files()
 
         results = {}
         status = {
@@ -313,17 +619,85 @@ class PoTranslator:
             "not_changed": 0,
         }
 
-        ######
-        for pot_file in pot_files:
-            # path = join(self.pot_dir, pot_file)
-            path = pot_file
-            results[pot_file] = self.translate_from_pot(
-                path,
+        # the next pot files are parsed while the current one is translated
+        for pot_file, pot in _prefetch(pot_files, encoding):
+            results[pot_file] = self._translate_from_pot(
+                pot_file,
                 status,
                 target_langs=target_langs,
                 src_lang=src_lang,
                 encoding=encoding,
                 auto_save=auto_save,
                 compiled=compiled,
+                pot=pot,
             )
+        self.flush()
+        return results
+
+    async def translate_all_pot_async(
+        self,
+        target_langs,
+        src_lang="auto",
+        encoding="utf-8",
+        auto_save=False,
+        compiled=False,
+        concurrency=16,
+    ):
+        """
+        | Coroutine version of translate_all_pot, to be driven with asyncio.run.
+        | Every (pot file, target language) pair is translated concurrently.
+
+        :param target_langs: sequence of strings.
+            Target language for translation.
+        :param src_lang: string.
+            Source language for translation.
+        :param encoding: string.
+            Encoding for saving the po files.
+        :param auto_save: bool.
+            Toggles auto save feature.
+        :param compiled: bool.
+            Toggles compilation to mo files.
+        :param concurrency: int.
+            Maximum number of po files being translated at the same time.
+        :return: Dictionary.
+            A dictionary of po files.
+        """
+        pot_files = self._pot_files()
+
+        results = {pot_file: {} for pot_file in pot_files}
+        status = {
+            "created": 0,
+            "updated": 0,
+            "not_changed": 0,
+        }
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(pot_file, pot_text, pot_bytes, target_lang):
+            async with semaphore:
+                po_path, po_file_name, po = self._create_po(
+                    pot_file, pot_text, pot_bytes, target_lang, status, encoding
+                )
+                results[pot_file][target_lang], updated = await self._translate_async(
+                    po_path,
+                    target_lang=target_lang,
+                    src_lang=src_lang,
+                    encoding=encoding,
+                    auto_save=auto_save,
+                    compiled=compiled,
+                    po=po,
+                )
+                self._update_status(status, updated, po_file_name)
+
+        pots = []
+        for pot_file in pot_files:
+            pot_text = str(polib.pofile(pot_file, **{"encoding": encoding}))
+            pots.append((pot_file, pot_text, pot_text.encode(encoding)))
+        await asyncio.gather(
+            *(
+                bounded(pot_file, pot_text, pot_bytes, target_lang)
+                for pot_file, pot_text, pot_bytes in pots
+                for target_lang in target_langs
+            )
+        )
+        self.flush()
         return results
@@ -5,26 +5,39 @@
 from typing import Text, Any, Optional, Mapping, Tuple
 from googletrans import Translator
 from polib import POFile
+from .translation_memory import TranslationMemory
 
 _RESOURCE_PACKAGE: Text = __name__
 is_python2: bool
+DEFAULT_CACHE_FILE: Text
 
 class PoTranslator:
     pot_dir: Text = ...
     locale_dir: Text = ...
     translator: Translator = ...
+    memory: Optional[TranslationMemory] = ...
     def __init__(self,
                  pot_dir: Optional[Text] = ...,
-                 locale_dir: Optional[Text] = ...
+                 locale_dir: Optional[Text] = ...,
+                 cache_file: Optional[Text] = ...
                  ) -> None: ...
 
+    def __enter__(self) -> PoTranslator: ...
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None: ...
+
+    def flush(self, file_name: Optional[Text] = ...) -> None: ...
+
+    def close(self) -> None: ...
+
     def translate(self,
                   file_name: Text,
                   target_lang: Text = ...,
                   src_lang: Text = ...,
                   encoding: Text = ...,
                   auto_save: bool = ...,
-                  compiled: bool = ...
+                  compiled: bool = ...,
+                  po: Optional[POFile] = ...
                   ) -> Tuple[POFile, bool]: ...
 
     def translate_all_locale(self,
@@ -41,7 +54,8 @@ class PoTranslator:
                            src_lang: Text = ...,
                            encoding: Text = ...,
                            auto_save: bool = ...,
-                           compiled: bool = ...
+                           compiled: bool = ...,
+                           pot: Optional[POFile] = ...
                            ) -> Mapping[Text, Tuple[POFile, bool]]: ...
 
     def translate_all_pot(self,
@@ -51,3 +65,12 @@ class PoTranslator:
                           auto_save: bool = ...,
                           compiled: bool = ...
                           ) -> Mapping[Text, Mapping[Text, Tuple[POFile, bool]]]: ...
+
+    async def translate_all_pot_async(self,
+                                      target_langs: Any,
+                                      src_lang: Text = ...,
+                                      encoding: Text = ...,
+                                      auto_save: bool = ...,
+                                      compiled: bool = ...,
+                                      concurrency: int = ...
+                                      ) -> Mapping[Text, Mapping[Text, Tuple[POFile, bool]]]: ...
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""Persistent translation memory backed by SQLite."""
+
+import hashlib
+import sqlite3
+import threading
+
+# SQLite limits the number of host parameters in a single statement (999 on older builds).
+_SQL_CHUNK_SIZE = 900
+
+
+class TranslationMemory(object):
+    """
+    Stores the translations retrieved from the translation service so that identical msgids are
+    only ever sent once for a given language pair.
+
+    :param path: string.
+        Path to the SQLite database file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # the connection is shared by the threads translating several languages at once
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS tm (key TEXT PRIMARY KEY, text TEXT)"
+            )
+
+    @staticmethod
+    def make_key(msgid, src, dest, mime_type="text/plain"):
+        """
+        Computes the lookup key of a msgid.
+
+        :param msgid: string.
+            Source text.
+        :param src: string.
+            Source language.
+        :param dest: string.
+            Target language.
+        :param mime_type: string.
+            Mime type used to translate the text.
+        :return: string.
+            The hexadecimal sha1 digest identifying the translation.
+        """
+        return hashlib.sha1(
+            "|".join((src, dest, mime_type, msgid)).encode("utf-8")
+        ).hexdigest()
+
+    def lookup(self, keys):
+        """
+        Retrieves the stored translations for the given keys.
+
+        :param keys: sequence of strings.
+            Keys computed with make_key.
+        :return: Dictionary.
+            A dictionary mapping the found keys to their translation.
+        """
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), _SQL_CHUNK_SIZE):
+                chunk = keys[start : start + _SQL_CHUNK_SIZE]
+                rows = self.connection.execute(
+                    "SELECT key, text FROM tm WHERE key IN ({0})".format(
+                        ", ".join("?" * len(chunk))
+                    ),
+                    chunk,
+                )
+                found.update(rows)
+        return found
+
+    def store(self, items):
+        """
+        Stores translations in a single transaction.
+
+        :param items: sequence of (key, text) tuples.
+            Translations to store.
+        """
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO tm (key, text) VALUES (?, ?)", items
+            )
+
+    def close(self):
+        """
+        Closes the underlying database connection.
+        """
+        with self._lock:
+            self.connection.close()
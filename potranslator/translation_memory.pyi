@@ -0,0 +1,20 @@
+from typing import Text, Iterable, Mapping, Tuple
+from sqlite3 import Connection
+
+class TranslationMemory:
+    path: Text = ...
+    connection: Connection = ...
+    def __init__(self, path: Text) -> None: ...
+
+    @staticmethod
+    def make_key(msgid: Text,
+                 src: Text,
+                 dest: Text,
+                 mime_type: Text = ...
+                 ) -> Text: ...
+
+    def lookup(self, keys: Iterable[Text]) -> Mapping[Text, Text]: ...
+
+    def store(self, items: Iterable[Tuple[Text, Text]]) -> None: ...
+
+    def close(self) -> None: ...
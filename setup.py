@@ -14,6 +14,7 @@ with open("HISTORY.rst") as history_file:
 requirements = [
     "Click>=6.0",
     "google-cloud-translate>=3.0",
+    "numpy",
     "polib==1.1.0",
     "path.py==11.0.1",
     "importlib_resources==1.0.1",
@@ -43,6 +44,7 @@ test_requirements = [
 
 extras_require = {
     "transifex": ["transifex_client>=0.13.4"],
+    "numba": ["numba"],
 }
 
 setup(
@@ -3,10 +3,15 @@
 
 """Tests for `potranslator` package."""
 
+import asyncio
 import pytest
 import sys
 import os
 import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from textwrap import dedent
 from os.path import isfile, join, getmtime
 from os import remove
@@ -20,6 +25,8 @@ from path import Path as path
 
 from potranslator import PoTranslator
 from potranslator import commands
+from potranslator import gcloudtranslator
+from potranslator.translation_memory import TranslationMemory
 
 
 is_appveyor = 'APPVEYOR' in os.environ
@@ -78,6 +85,63 @@ def home_in_temp(request, tmpdir):
     return tmpdir
 
 
+class FakeTranslationClient(object):
+    """Offline stand-in of TranslationServiceClient, translations are the contents in upper case."""
+
+    def __init__(self, dropped=0, delay=0):
+        self.dropped = dropped
+        self.delay = delay
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def translate_text(self, request=None):
+        with self.lock:
+            self.requests.append(request)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        if request['mime_type'] == 'text/html':
+            contents = [re.sub(r'>([^<]*)<', lambda m: m.group(0).upper(), text) for text in request['contents']]
+        else:
+            contents = [text.upper() for text in request['contents']]
+        translations = [FakeTranslation(text) for text in contents]
+        return FakeResponse(translations[:len(translations) - self.dropped])
+
+
+class FakeAsyncTranslationClient(object):
+    """Offline stand-in of TranslationServiceAsyncClient, answering like the given FakeTranslationClient."""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def translate_text(self, request=None):
+        return self.client.translate_text(request=request)
+
+
+class FakeTranslation(object):
+    def __init__(self, translated_text):
+        self.translated_text = translated_text
+
+
+class FakeResponse(object):
+    def __init__(self, translations):
+        self.translations = translations
+
+
+@pytest.fixture(scope="function")
+def offline_client(monkeypatch):
+    """use a fake translation client instead of the Google Cloud Translation API"""
+    client = FakeTranslationClient()
+    monkeypatch.setenv('GOOGLE_APPLICATION_CREDENTIALS', 'credentials.json')
+    monkeypatch.setattr(gcloudtranslator.google.auth, 'default', lambda: (None, 'project'))
+    monkeypatch.setattr(gcloudtranslator, '_CLIENT', client)
+    return client
+
+
 class TestPoTranslator:
     test_languages = ('es', 'fr', 'it', 'pt', 'ro')
 
@@ -86,7 +150,7 @@ class TestPoTranslator:
 
         :return:
         """
-        translator = PoTranslator(pot_dir='./test_pot_files', locale_dir='./locale')
+        translator = PoTranslator(pot_dir='./test_pot_files', locale_dir='./locale', cache_file=None)
         test_po_file = './empty_test.po'
         with pytest.raises(ValueError):
             failed_translation = translator.translate(test_po_file, 'sp')
@@ -97,7 +161,7 @@ class TestPoTranslator:
 
         :return:
         """
-        translator = PoTranslator(pot_dir='./test_pot_files', locale_dir='./locale')
+        translator = PoTranslator(pot_dir='./test_pot_files', locale_dir='./locale', cache_file=None)
         test_po_file = './empty_test.po'
         with pytest.raises(ValueError):
             failed_translation = translator.translate(test_po_file)
@@ -108,7 +172,7 @@ class TestPoTranslator:
 
         :return:
         """
-        translator = PoTranslator(pot_dir='./test_pot_files', locale_dir='./locale')
+        translator = PoTranslator(pot_dir='./test_pot_files', locale_dir='./locale', cache_file=None)
         test_po_file = './empty_test.po'
         translation, updated = translator.translate(test_po_file, 'es')
         assert all([entry.msgstr != '' for entry in translation])
@@ -123,7 +187,7 @@ class TestPoTranslator:
 
         :return:
         """
-        translator = PoTranslator(pot_dir='./test_pot_files', locale_dir='./locale')
+        translator = PoTranslator(pot_dir='./test_pot_files', locale_dir='./locale', cache_file=None)
         test_po_file = './empty_test.po'
         modif_time = getmtime(test_po_file)
         translation, updated = translator.translate(test_po_file, 'es', auto_save=True)
@@ -136,7 +200,7 @@ class TestPoTranslator:
 
         :return:
         """
-        translator = PoTranslator(pot_dir='./test_pot_files', locale_dir='./locale')
+        translator = PoTranslator(pot_dir='./test_pot_files', locale_dir='./locale', cache_file=None)
         translations = translator.translate_all_locale()
         assert not 'sp' in translations
         assert all(k in translations for k in self.test_languages)
@@ -157,7 +221,7 @@ class TestPoTranslator:
             'updated': 0,
             'not_changed': 0,
         }
-        translator = PoTranslator(pot_dir='./test_pot_files', locale_dir='./locale')
+        translator = PoTranslator(pot_dir='./test_pot_files', locale_dir='./locale', cache_file=None)
         test_pot_file = './test_pot_files/test-usage.pot'
         translations = translator.translate_from_pot(test_pot_file, status, target_langs=self.test_languages)
         assert all(k in translations for k in self.test_languages)
@@ -173,7 +237,7 @@ class TestPoTranslator:
 
         :return:
         """
-        translator = PoTranslator(pot_dir='./test_pot_files', locale_dir='./locale')
+        translator = PoTranslator(pot_dir='./test_pot_files', locale_dir='./locale', cache_file=None)
         translations = translator.translate_all_pot(target_langs=self.test_languages)
         assert all(k in translations['test-authors.pot'] for k in self.test_languages)
         assert all(k in translations['test-usage.pot'] for k in self.test_languages)
@@ -184,6 +248,214 @@ class TestPoTranslator:
             assert translations['test-authors.pot']['es'][0].msgstr.encode('utf-8') == 'Créditos'
         return
 
+    def test_translate_missing_translations(self, offline_client, temp_test_data):
+        """
+
+        :return:
+        """
+        offline_client.dropped = 1
+        translator = PoTranslator(pot_dir='./test_pot_files', locale_dir='./locale', cache_file=None)
+        translation, updated = translator.translate('./empty_test.po', 'es')
+        assert translation[0].msgstr == 'CREDITS'
+        assert translation[-1].msgstr == ''
+        return
+
+    def test_default_cache_file(self, offline_client, home_in_temp, temp_test_data):
+        """
+
+        :return:
+        """
+        translator = PoTranslator(pot_dir='./test_pot_files', locale_dir='./locale')
+        assert translator.memory.path == str(home_in_temp / '.potranslator_cache.sqlite')
+        translator.close()
+        return
+
+    def test_unwritable_cache_file(self, offline_client, monkeypatch, tmpdir):
+        """
+
+        :return:
+        """
+        monkeypatch.setenv('HOME', str(tmpdir / 'missing'))
+        translator = PoTranslator(pot_dir='./test_pot_files', locale_dir='./locale')
+        assert translator.memory is None
+        with pytest.raises(sqlite3.Error):
+            PoTranslator(pot_dir='./test_pot_files', locale_dir='./locale',
+                         cache_file=str(tmpdir / 'missing' / 'cache.sqlite'))
+        return
+
+
+class TestTranslator:
+    def test_translate_string(self):
+        """
+
+        :return:
+        """
+        translator = gcloudtranslator.Translator()
+        translations = translator.translate('Credits', src='en', dest='es')
+        assert len(translations) == 1
+        if not is_python2:
+            assert translations[0].text == 'Créditos'
+        else:
+            assert translations[0].text.encode('utf-8') == 'Créditos'
+        return
+
+    def test_translate_packed(self):
+        """
+
+        :return:
+        """
+        translator = gcloudtranslator.Translator(pack_strategy='html')
+        texts = ['Credits', 'Authors', '<b>Credits</b>']
+        assert not translator._packable(texts)
+        assert translator._packable(texts[:2])
+        translations = translator.translate(texts[:2], src='en', dest='es')
+        assert len(translations) == 2
+        if not is_python2:
+            assert translations[0].text == 'Créditos'
+        else:
+            assert translations[0].text.encode('utf-8') == 'Créditos'
+        return
+
+
+    def test_concurrency_limit(self, offline_client):
+        """
+
+        :return:
+        """
+        offline_client.delay = 0.01
+        translator = gcloudtranslator.Translator(max_workers=2)
+        msgids = ['msgid {0}'.format(i) for i in range(3000)]
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            list(executor.map(lambda dest: translator.translate(msgids, 'en', dest), ('es', 'fr', 'it', 'pt', 'ro')))
+        assert offline_client.max_active == 2
+        return
+
+    def test_translate_packed_offline(self, offline_client):
+        """
+
+        :return:
+        """
+        translator = gcloudtranslator.Translator(pack_strategy='html')
+        msgids = ['msgid {0} > "x"'.format(i) for i in range(250)]
+        assert len(translator._pack(msgids)) == sum(
+            len(text) + 3 * text.count('>') + 19 + len(str(idx)) for idx, text in enumerate(msgids))
+        translations = translator.translate(msgids, 'en', 'es')
+        assert [translation.text for translation in translations] == [text.upper() for text in msgids]
+        assert [request['mime_type'] for request in offline_client.requests] == ['text/html']
+        assert not translator._packable(['Name: ', 'Credits'])
+        assert not translator._packable(['Name', 'a & b'])
+        return
+
+    def test_cutoffs(self):
+        """
+
+        :return:
+        """
+        inputs = [
+            [6000, 0], [0, 0], [0], [10, 0, 0], [6000, 0, 10], [30000, 0],
+            [1200] * 12 + [26000] + [10] * 3, [4999, 1, 0, 5000, 0, 0],
+        ]
+        for scanner in (gcloudtranslator._scan_cutoffs, gcloudtranslator._numpy_cutoffs, gcloudtranslator._cutoffs):
+            for lengths in inputs:
+                cutoffs = scanner(gcloudtranslator.np.array(lengths, dtype=gcloudtranslator.np.int64), 5000, 28000)
+                cutoffs = cutoffs.tolist()
+                assert cutoffs == sorted(set(cutoffs))
+                assert cutoffs[0] > 0 and cutoffs[-1] == len(lengths)
+                assert all(sum(lengths[start:end]) <= 28000 or end - start == 1
+                           for start, end in zip([0] + cutoffs, cutoffs))
+            assert scanner(gcloudtranslator.np.array([6000, 0]), 5000, 28000).tolist() == [1, 2]
+            assert scanner(gcloudtranslator.np.array([0, 0]), 5000, 28000).tolist() == [2]
+        return
+
+    def test_translate_empty_strings(self, offline_client, monkeypatch):
+        """
+
+        :return:
+        """
+        for scanner in (gcloudtranslator._scan_cutoffs, gcloudtranslator._numpy_cutoffs):
+            monkeypatch.setattr(gcloudtranslator, '_cutoffs', scanner)
+            translator = gcloudtranslator.Translator()
+            translator.window_size = 2
+            translations = translator.translate(['a' * 6000, '', 'hello', 'world'], 'en', 'es')
+            assert [translation.text for translation in translations] == ['A' * 6000, '', 'HELLO', 'WORLD']
+        return
+
+    def test_translate_async(self, offline_client, monkeypatch):
+        """
+
+        :return:
+        """
+        monkeypatch.setattr(gcloudtranslator.translate, 'TranslationServiceAsyncClient',
+                            lambda: FakeAsyncTranslationClient(offline_client))
+        msgids = ['msgid {0}'.format(i) for i in range(300)] + ['<b>bold</b>', 'Name: ']
+        translator = gcloudtranslator.Translator(pack_strategy='html')
+        translations = [translation.text for translation in translator.translate(msgids, 'en', 'es')]
+        sent = offline_client.requests[:]
+        del offline_client.requests[:]
+        translator = gcloudtranslator.Translator(pack_strategy='html')
+        async_translations = asyncio.run(translator.translate_async(msgids, 'en', 'es'))
+        assert [translation.text for translation in async_translations] == translations
+        assert offline_client.requests == sent
+        return
+
+    def test_translate_long_string(self, offline_client):
+        """
+
+        :return:
+        """
+        translator = gcloudtranslator.Translator()
+        texts = ['word ' * 7000, 'a' * 60000, 'Credits']
+        translations = translator.translate(texts, 'en', 'es')
+        assert [translation.text for translation in translations] == [text.upper() for text in texts]
+        assert all(len(text) <= translator.max_chars
+                   for request in offline_client.requests for text in request['contents'])
+        return
+
+    def test_make_batches(self, offline_client):
+        """
+
+        :return:
+        """
+        translator = gcloudtranslator.Translator()
+        texts = ['x' * 1200] * 12 + ['y' * 26000] + ['z' * 10] * 3
+        cutoffs = translator.count_chars(texts)
+        assert cutoffs == sorted(set(cutoffs))
+        assert cutoffs[-1] == len(texts)
+        requests = list(translator.make_batches(texts, 'en', 'es', 'projects/project/locations/global'))
+        assert [text for request in requests for text in request['contents']] == texts
+        assert len(set(id(request['contents']) for request in requests)) == len(requests)
+        assert all(sum(map(len, request['contents'])) <= translator.max_chars for request in requests)
+        return
+
+    def test_make_batches_limits(self, offline_client):
+        """
+
+        :return:
+        """
+        translator = gcloudtranslator.Translator()
+        requests = list(translator.make_batches(['a'] * 250, 'en', 'es', 'projects/project/locations/global'))
+        assert [len(request['contents']) for request in requests] == [100, 100, 50]
+        translator.max_bytes = 40
+        requests = list(translator.make_batches(['é' * 5] * 10, 'en', 'es', 'projects/project/locations/global'))
+        assert [len(request['contents']) for request in requests] == [4, 4, 2]
+        return
+
+
+class TestTranslationMemory:
+    def test_store_and_lookup(self, tmpdir):
+        """
+
+        :return:
+        """
+        memory = TranslationMemory(str(tmpdir / 'cache.sqlite'))
+        key = TranslationMemory.make_key('Credits', 'en', 'es')
+        assert key != TranslationMemory.make_key('Credits', 'en', 'fr')
+        assert memory.lookup([key]) == {}
+        memory.store([(key, 'Créditos')])
+        assert memory.lookup([key, 'missing']) == {key: 'Créditos'}
+        memory.close()
+        return
+
 
 class TestCommandLine:
     def test_command_line_interface(self):